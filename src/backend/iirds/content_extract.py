@@ -1,8 +1,45 @@
 '''Extract text content from various document formats.'''
 
-from bs4 import BeautifulSoup
-from io import BytesIO
-from pypdf import PdfReader
+import codecs
+import re
+from typing import Optional
+from lxml import etree
+from selectolax.lexbor import LexborHTMLParser, SelectolaxError
+import pymupdf
+
+_BOMS = ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+_XML_DECL_ENC = re.compile(rb'^\s*<\?xml[^>]*?encoding\s*=\s*["\']([A-Za-z0-9._:-]+)')
+_META_CHARSET = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?([A-Za-z0-9._:-]+)', re.I)
+
+def _detect_encoding(content: bytes) -> str:
+    '''
+    Work out the character encoding of an (X)HTML document.
+
+    Checks a byte order mark, then the XML declaration, then a <meta> charset in
+    the head. Without any of these the content is taken as UTF-8 if it decodes
+    as such, else as windows-1252.
+
+    Args:
+        content (bytes): The (X)HTML content as bytes.
+
+    Returns:
+        str: A Python codec name.
+    '''
+    for bom, enc in _BOMS:
+        if content.startswith(bom):
+            return enc
+    head = content[:2048]
+    m = _XML_DECL_ENC.match(head) or _META_CHARSET.search(head)
+    if m:
+        try:
+            return codecs.lookup(m.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    try:
+        content.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "windows-1252"
 
 def extract_text_from_xhtml(content: bytes) -> str:
     '''
@@ -14,20 +51,49 @@ def extract_text_from_xhtml(content: bytes) -> str:
     Returns:
         str: The extracted text.
     '''
-    soup = BeautifulSoup(content, "lxml")
+    # lexbor decodes bytes as UTF-8 regardless of the declared charset, so decode here
+    encoding = _detect_encoding(content)
+    try:
+        tree = LexborHTMLParser(content.decode(encoding, errors="replace"))
+    except SelectolaxError:
+        return _extract_text_from_xhtml_lxml(content, encoding)
+    root = tree.root
+    if root is None:
+        return ""
     # Keep human-visible text; drop nav/figcaptions if desired
-    return soup.get_text(" ", strip=True)
+    tree.strip_tags(["script", "style"])
+    # whitespace-only nodes come back as empty strings; drop them
+    return " ".join(t for t in root.text(separator="\x00", strip=True).split("\x00") if t)
+
+def _extract_text_from_xhtml_lxml(content: bytes, encoding: Optional[str] = None) -> str:
+    '''
+    Fallback text extraction with lxml for content selectolax cannot parse.
+
+    Args:
+        content (bytes): The XHTML content as bytes.
+        encoding (Optional[str]): Character encoding of content; detected if None.
+
+    Returns:
+        str: The extracted text.
+    '''
+    root = etree.fromstring(content, etree.HTMLParser(encoding=encoding or _detect_encoding(content)))
+    if root is None:
+        return ""
+    etree.strip_elements(root, "script", "style", etree.Comment, with_tail=False)
+    return " ".join(t.strip() for t in root.itertext() if t and t.strip())
 
-def extract_text_from_pdf(content: bytes) -> str:
+def extract_text_from_pdf(content: bytes, flags: Optional[int] = None) -> str:
     '''
     Extract text from PDF content.
     
     Args:
         content (bytes): The PDF content as bytes.
+        flags (Optional[int]): PyMuPDF text flags, e.g.
+            pymupdf.TEXT_PRESERVE_LIGATURES | pymupdf.TEXT_DEHYPHENATE.
         
     Returns:
         str: The extracted text.
     '''
-    reader = PdfReader(BytesIO(content))
-    pages = [p.extract_text() or "" for p in reader.pages]
+    with pymupdf.open(stream=content, filetype="pdf") as doc:
+        pages = [p.get_text("text", flags=flags) or "" for p in doc]
     return "\n".join(pages)
@@ -1,13 +1,16 @@
 '''Ingest II RDS ZIP packages, extract content, and store in vector DB and graph DB.'''
 
-import io, zipfile, hashlib
+import io, multiprocessing, os, sys, threading, zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from typing import Dict, List, Optional
+import blake3
 from backend.iirds.rdf_extract import parse_metadata_rdf
 from backend.iirds.content_extract import extract_text_from_xhtml, extract_text_from_pdf
 from backend.rag.chunking import chunk_text
 from backend.rag.embeddings import get_embedder
-from backend.rag.chroma_store import ChromaStore
+from backend.rag.chroma_store import ChromaStore, Payload
 from backend.rag.neo4j_store import Neo4jStore
 
 import logging
@@ -15,6 +18,50 @@ log = logging.getLogger("iirds.ingest")
 
 SUPPORTED_TEXT = (".xhtml", ".htm", ".html")
 SUPPORTED_PDF = (".pdf",)
+EXT_HANDLERS = {
+    **dict.fromkeys(SUPPORTED_TEXT, extract_text_from_xhtml),
+    **dict.fromkeys(SUPPORTED_PDF, extract_text_from_pdf),
+}
+CHROMA_BATCH_SIZE = int(os.getenv("CHROMA_BATCH_SIZE", "256"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+MAX_INFLIGHT = 2 * INGEST_WORKERS
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _extract_pool() -> ProcessPoolExecutor:
+    '''
+    Return the process pool shared by all ingests, creating it on first use.
+
+    Workers are started from a forkserver (spawn where unavailable) rather than
+    forked from the API process, whose threads a forked child would inherit.
+
+    Returns:
+        ProcessPoolExecutor: The shared extraction pool.
+    '''
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    '''
+    Drop a broken extraction pool so the next ingest starts a fresh one.
+
+    A worker that dies (e.g. a crash in a PDF library or an OOM kill) leaves
+    the pool unusable for good.
+
+    Args:
+        pool (ProcessPoolExecutor): The pool that raised BrokenProcessPool.
+    '''
+    global _pool
+    with _pool_lock:
+        # another ingest may already have replaced it
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
 
 class IirdsIngestor:
     def __init__(self, chroma: ChromaStore, neo4j: Neo4jStore, base_source="upload"):
@@ -44,16 +91,79 @@ class IirdsIngestor:
         for k, v in attrs.items():
             if isinstance(v, (list, tuple, set)):
                 vals = [str(x) for x in v]
-                # join all values; still human-readable, but scalar
-                out[k] = ";".join(vals) if vals else None
+                # join all values; still human-readable, but scalar. Parents usually
+                # share the same facet lists, so intern to keep one copy per value
+                out[k] = sys.intern(";".join(vals)) if vals else None
             else:
                 out[k] = v
         return out
 
+    def _flush(self, payloads: List[Payload]) -> int:
+        '''
+        Upsert payloads into Chroma in fixed-size sub-batches.
+
+        Args:
+            payloads (List[Payload]): The Chroma payloads to upsert.
+
+        Returns:
+            int: The number of payloads written.
+        '''
+        # upsert embeds each distinct text of a batch once
+        for i in range(0, len(payloads), CHROMA_BATCH_SIZE):
+            self.chroma.upsert(payloads[i:i + CHROMA_BATCH_SIZE], self.embed)
+        return len(payloads)
+
+    def _extract_renditions(self, zf: zipfile.ZipFile, jobs: List[tuple]):
+        '''
+        Extract rendition texts in worker processes while reading members lazily.
+
+        Only up to MAX_INFLIGHT members are held in memory at once, so peak memory
+        is bounded by a few rendition sizes rather than the whole package.
+
+        Args:
+            zf (zipfile.ZipFile): The ZIP file object.
+            jobs (List[tuple]): (src, ext, parent_iri, fmt) tuples of renditions to extract.
+
+        Yields:
+            tuple: (src, parent_iri, fmt, text) in completion order.
+        '''
+        todo = iter(jobs)
+        pending = {}
+        pool = _extract_pool()
+        try:
+            while True:
+                # the ZipFile handle can't be shared with workers, so read here and ship bytes;
+                # the handlers live in content_extract, the only module workers need to import
+                while len(pending) < MAX_INFLIGHT:
+                    job = next(todo, None)
+                    if job is None:
+                        break
+                    src, ext, parent_iri, fmt = job
+                    try:
+                        with zf.open(src) as fh:
+                            content_bytes = fh.read()
+                    except KeyError:
+                        continue
+                    pending[pool.submit(EXT_HANDLERS[ext], content_bytes)] = (src, parent_iri, fmt)
+                    del content_bytes
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    src, parent_iri, fmt = pending.pop(fut)
+                    yield src, parent_iri, fmt, fut.result()
+        except BrokenProcessPool:
+            # fail this ingest only
+            _discard_pool(pool)
+            raise
+        finally:
+            # the pool outlives this ingest; drop work nobody will collect
+            for fut in pending:
+                fut.cancel()
+
     def ingest_zip_bytes(self, blob: bytes, zip_name: str,
                          chunk_tokens: int = 250, overlap_tokens: int = 40,
                          min_chunk_chars: int = 40) -> Dict:
-        zf = zipfile.ZipFile(io.BytesIO(blob))
         '''Ingest an II RDS ZIP package from bytes.
         
         Args:
@@ -66,20 +176,48 @@ class IirdsIngestor:
         Returns:
             Dict: Summary of the ingestion process.
         '''
+        with zipfile.ZipFile(io.BytesIO(blob)) as zf:
+            return self._ingest_zip(zf, zip_name, chunk_tokens, overlap_tokens, min_chunk_chars)
+
+    def ingest_zip_path(self, path: str, zip_name: str,
+                        chunk_tokens: int = 250, overlap_tokens: int = 40,
+                        min_chunk_chars: int = 40) -> Dict:
+        '''Ingest an II RDS ZIP package from a file on disk.
+
+        Members are read from the file as they are needed, so the package is
+        never held in memory as a whole.
+
+        Args:
+            path (str): Path to the ZIP package.
+            zip_name (str): The name of the ZIP package.
+            chunk_tokens (int): Target number of tokens per text chunk.
+            overlap_tokens (int): Number of overlapping tokens between chunks.
+            min_chunk_chars (int): Minimum number of characters for a chunk to be kept.
+
+        Returns:
+            Dict: Summary of the ingestion process.
+        '''
+        with zipfile.ZipFile(path) as zf:
+            return self._ingest_zip(zf, zip_name, chunk_tokens, overlap_tokens, min_chunk_chars)
 
+    def _ingest_zip(self, zf: zipfile.ZipFile, zip_name: str,
+                    chunk_tokens: int, overlap_tokens: int, min_chunk_chars: int) -> Dict:
+        '''Ingest an opened II RDS ZIP package; see ingest_zip_bytes for the arguments.'''
         try:
             rdf_bytes = zf.read("META-INF/metadata.rdf")
         except KeyError as e:
             raise KeyError("META-INF/metadata.rdf not found in package") from e
 
         graph_data = parse_metadata_rdf(rdf_bytes)
-        self.neo4j.upsert_graph(graph_data)
 
         package_iri = (graph_data.get("package") or {}).get("iri")
-        chroma_payloads: List[Dict] = []
+        chroma_payloads: List[Payload] = []
+        chunks_written = 0
         chunk_nodes: List[Dict] = []
-        attrs_cache: Dict[str, Dict] = {}
 
+        zip_index = _ZipIndex(zf)
+
+        jobs = []
         for rend in graph_data.get("renditions", []):
             raw_src = (rend.get("source_path") or "").lstrip("/")
             parent_iri = rend["parent_iri"]
@@ -87,73 +225,81 @@ class IirdsIngestor:
             if not raw_src:
                 continue
 
-            src = self._resolve_zip_path(zf, raw_src)
-            if not src:
+            # the extension is known from the RDF path; skip before any ZIP lookup
+            dot = raw_src.rfind(".")
+            ext = raw_src[dot:].lower() if dot != -1 else ""
+            if ext not in EXT_HANDLERS:
                 continue
 
-            try:
-                content_bytes = zf.read(src)
-            except KeyError:
+            src = self._resolve_zip_path(zip_index, raw_src)
+            if not src:
                 continue
+            jobs.append((src, ext, parent_iri, fmt))
 
-            ext = Path(src).suffix.lower()
-            if ext in SUPPORTED_TEXT:
-                text = extract_text_from_xhtml(content_bytes)
-            elif ext in SUPPORTED_PDF:
-                text = extract_text_from_pdf(content_bytes)
-            else:
-                continue
+        # start the slow PDFs first so they don't trail behind the XHTML tail
+        jobs.sort(key=lambda j: j[1] not in SUPPORTED_PDF)
+
+        # graph attributes per parent, straight from the parsed metadata; the graph
+        # itself is written together with the chunks once ingest is done
+        attrs_cache: Dict[str, Dict] = {
+            iu["iri"]: {k: iu.get(k, []) for k in ("product_variants", "components", "roles", "doc_types")}
+            for iu in graph_data.get("documents", []) + graph_data.get("topics", [])
+        }
+        scalar_cache: Dict[str, Dict] = {}
 
+        for src, parent_iri, fmt, text in self._extract_renditions(zf, jobs):
             if not text or text.strip() == "":
                 continue
 
-            if parent_iri not in attrs_cache:
-                attrs_cache[parent_iri] = {
-                    "product_variants": self.neo4j.fetch_variants(parent_iri),
-                    "components": self.neo4j.fetch_components(parent_iri),
-                    "roles": self.neo4j.fetch_roles(parent_iri),
-                    "doc_types": self.neo4j.fetch_doc_types(parent_iri),
+            # metadata shared by every chunk of the parent, built once per parent
+            scalar_meta = scalar_cache.get(parent_iri)
+            if scalar_meta is None:
+                scalar_meta = scalar_cache[parent_iri] = {
+                    "source_zip": zip_name,
+                    "package": package_iri,
+                    "parent_iri": parent_iri,
+                    # NEW: convert list-valued attrs to scalar strings for Chroma
+                    **self._scalarize_meta_values(attrs_cache.get(parent_iri, {})),
                 }
-            cached_attrs = attrs_cache[parent_iri]
-
-            # NEW: convert list-valued attrs to scalar strings for Chroma
-            scalar_attrs = self._scalarize_meta_values(cached_attrs)
+            # format strings repeat across every rendition; share one copy
+            rendition_meta = {**scalar_meta, "path": src, "format": sys.intern(fmt)}
 
             for start, end, chunk in chunk_text(text, target_tokens=chunk_tokens, overlap_tokens=overlap_tokens):
                 if len(chunk) < min_chunk_chars:
                     continue
                 chunk_id = self._chunk_id(zip_name, src, start, end, chunk)
-                meta = {
-                    "chunk_id": chunk_id,
-                    "source_zip": zip_name,
-                    "package": package_iri,
-                    "path": src,
-                    "parent_iri": parent_iri,
-                    "format": fmt,
-                    "text_len": len(chunk),
-                    **scalar_attrs,
-                }
-                chroma_payloads.append({"id": chunk_id, "text": chunk, "metadata": meta})
-                chunk_nodes.append({"chunk_id": chunk_id, "path": src, "start": start, "end": end, "parent_iri": parent_iri})
+                meta = {**rendition_meta, "chunk_id": chunk_id, "text_len": len(chunk)}
+                chroma_payloads.append(Payload(chunk_id, chunk, meta))
+                chunk_nodes.append({"chunk_id": chunk_id, "package": package_iri, "source_zip": zip_name,
+                                    "path": src, "start": start, "end": end, "parent_iri": parent_iri})
+
+            # write full batches as we go; the remainder waits for the final flush
+            if len(chroma_payloads) >= CHROMA_BATCH_SIZE:
+                full = len(chroma_payloads) - len(chroma_payloads) % CHROMA_BATCH_SIZE
+                chunks_written += self._flush(chroma_payloads[:full])
+                del chroma_payloads[:full]
 
         if chroma_payloads:
-            self.chroma.upsert(chroma_payloads, self.embed)
+            chunks_written += self._flush(chroma_payloads)
 
-        if chunk_nodes:
-            self.neo4j.link_chunks(chunk_nodes)
+        # only now that the new chunks are stored, drop what an earlier ingest of the
+        # same package left behind (ids that this ingest didn't write again)
+        self.neo4j.upsert_package_with_chunks(graph_data, chunk_nodes, source_zip=zip_name)
+        self.chroma.delete_stale({"package": package_iri} if package_iri else {"source_zip": zip_name},
+                                 [c["chunk_id"] for c in chunk_nodes])
 
         log.info(
-            f"ingest_zip_bytes: package={package_iri} "
+            f"_ingest_zip: package={package_iri} "
             f"topics={len(graph_data.get('topics', []))} "
             f"renditions={len(graph_data.get('renditions', []))} "
-            f"chunks={len(chroma_payloads)}"
+            f"chunks={chunks_written}"
         )
 
         return {
             "package": package_iri,
             "topics": len(graph_data.get("topics", [])),
             "documents": len(graph_data.get("documents", [])),
-            "chunks": len(chroma_payloads),
+            "chunks": chunks_written,
             "renditions_seen": len(graph_data.get("renditions", [])),
         }
 
@@ -171,40 +317,59 @@ class IirdsIngestor:
         Returns:
             str: A unique chunk ID.
         '''
-        h = hashlib.sha1(f"{zip_name}|{path}|{start}|{end}|{text[:64]}".encode("utf-8")).hexdigest()
-        return f"chk_{h}"
-
-    def _resolve_zip_path(self, zf: zipfile.ZipFile, src: str) -> Optional[str]:
+        h = blake3.blake3()
+        h.update(zip_name.encode("utf-8"))
+        h.update(b"|")
+        h.update(path.encode("utf-8"))
+        h.update(start.to_bytes(8, "little"))
+        h.update(end.to_bytes(8, "little"))
+        h.update(text[:64].encode("utf-8"))
+        return "chk_" + h.hexdigest(16)
+
+    def _resolve_zip_path(self, idx: "_ZipIndex", src: str) -> Optional[str]:
         '''
         Resolve the correct file path within a ZIP archive, handling case insensitivity and basename matching.
 
         Args:
-            zf (zipfile.ZipFile): The ZIP file object.
+            idx (_ZipIndex): The name index of the ZIP file.
             src (str): The source file path to resolve.
 
         Returns:
             Optional[str]: The resolved file path within the ZIP, or None if not found.
         '''
-        names = zf.namelist()
         src_norm = src.lstrip("/")
 
         # 1) exact match
-        if src_norm in names:
+        if src_norm in idx.names:
             return src_norm
 
         # 2) case-insensitive match
-        lowered = {n.lower(): n for n in names}
-        if src_norm.lower() in lowered:
-            return lowered[src_norm.lower()]
+        hit = idx.lowered.get(src_norm.lower())
+        if hit is not None:
+            return hit
 
         # 3) basename match
-        tail = Path(src_norm).name.lower()
-        candidates = [n for n in names if n.lower().endswith("/" + tail) or n.lower() == tail]
-        if candidates:
-            # prefer content/ paths where present
-            for n in candidates:
-                if n.lower().startswith("content/"):
-                    return n
-            return candidates[0]
-
-        return None
+        return idx.by_tail.get(Path(src_norm).name.lower())
+
+
+class _ZipIndex:
+    '''Lookup tables over a ZIP's member names, built once per package.'''
+
+    def __init__(self, zf: zipfile.ZipFile):
+        '''
+        Index the member names of a ZIP file.
+
+        Args:
+            zf (zipfile.ZipFile): The ZIP file object.
+        '''
+        names = zf.namelist()
+        self.names = set(names)
+        self.lowered = {n.lower(): n for n in names}
+        # basename -> preferred member (content/ paths win, else first seen)
+        self.by_tail: Dict[str, str] = {}
+        for n in names:
+            ln = n.lower()
+            tail = ln.rsplit("/", 1)[-1]
+            cur = self.by_tail.get(tail)
+            if cur is None or (ln.startswith("content/") and not cur.lower().startswith("content/")):
+                self.by_tail[tail] = n
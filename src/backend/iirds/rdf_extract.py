@@ -1,43 +1,263 @@
 '''RDF metadata extractor for IIRDS packages.'''
 
-from rdflib import Graph, Namespace, URIRef, Literal
-from rdflib.namespace import RDF, RDFS, DCTERMS, DC
+import os
+import sys
+from copy import deepcopy
+from io import BytesIO
+from itertools import count
 from typing import Dict, Optional, List
+from urllib.parse import urljoin
+import blake3
+import orjson
+from lxml import etree
 
-IIRDS = Namespace("http://iirds.tekom.de/iirds#")
+# namespaces as plain IRI prefixes
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+RDFS = "http://www.w3.org/2000/01/rdf-schema#"
+DCTERMS = "http://purl.org/dc/terms/"
+DC = "http://purl.org/dc/elements/1.1/"
+IIRDS = "http://iirds.tekom.de/iirds#"
+XML = "http://www.w3.org/XML/1998/namespace"
+
+RDF_TYPE = RDF + "type"
+# parsed metadata cached by RDF content hash; "" disables the cache
+RDF_CACHE_DIR = os.getenv("RDF_CACHE_DIR", os.path.join(os.getenv("UPLOAD_DIR", "/uploads"), "_rdf_cache"))
+# bump when the extraction output changes; entries of other versions are deleted
+_CACHE_VERSION = b"1"
+_CACHE_PREFIX = f"v{_CACHE_VERSION.decode()}-"
+# most cache entries kept; the least recently used beyond this are deleted
+RDF_CACHE_MAX_ENTRIES = int(os.getenv("RDF_CACHE_MAX_ENTRIES", "256"))
 SUPPORTED_EXT = (".xhtml", ".html", ".htm", ".pdf")
+# longest extension; only this many trailing chars need lower-casing
+_EXT_TAIL = max(map(len, SUPPORTED_EXT))
+
+# iiRDS classes
+T_PACKAGE = IIRDS + "Package"
+T_DOCUMENT = IIRDS + "Document"
+T_TOPIC = IIRDS + "Topic"
+T_RENDITION = IIRDS + "Rendition"
+
+# rendition predicates, for both vocab styles
+P_HAS_RENDITION = (IIRDS + "has-rendition", IIRDS + "hasRendition", IIRDS + "Rendition")
+P_SOURCE = (IIRDS + "source", IIRDS + "Source", DCTERMS + "source")
+P_FORMAT = (IIRDS + "format", IIRDS + "Format", DCTERMS + "format")
+P_CONTENT_REF = (IIRDS + "contentReference",)
+P_SOURCE_CONTENT = P_CONTENT_REF + P_SOURCE
+
+# per-IU attributes -> predicates to try in order (modern, hyphenated first; legacy after)
+IU_SCALAR_PREDS = {
+    # labels/titles/language
+    "label": (RDFS + "label", DCTERMS + "title", DC + "title"),
+    "language": (IIRDS + "language", DCTERMS + "language", DC + "language"),
+    # status (optional)
+    "status_value": (IIRDS + "has-content-lifecycle-status-value", IIRDS + "InformationUnitLifecycleStatusValue"),
+    "status_date": (IIRDS + "dateOfStatus", IIRDS + "InformationUnitLifecycleStatusDate"),
+}
+IU_LIST_PREDS = {
+    "doc_types": (IIRDS + "is-applicable-for-document-type", IIRDS + "DocumentType"),
+    "product_variants": (IIRDS + "relates-to-product-variant", IIRDS + "ProductVariant"),
+    "components": (IIRDS + "relates-to-component", IIRDS + "Component"),
+    "roles": (IIRDS + "relates-to-qualification", IIRDS + "hasRole"),
+    "subjects": (IIRDS + "has-subject", IIRDS + "Subject"),
+    "phases": (IIRDS + "relates-to-product-lifecycle-phase", IIRDS + "ProductLifecyclePhase"),
+}
+
+# subject -> predicate -> objects, all as strings; blank nodes are "_:"-prefixed
+Index = Dict[str, Dict[str, List[str]]]
+
+_RDF_RDF = f"{{{RDF}}}RDF"
+_RDF_DESCRIPTION = f"{{{RDF}}}Description"
+_RDF_ABOUT = f"{{{RDF}}}about"
+_RDF_ID = f"{{{RDF}}}ID"
+_RDF_NODEID = f"{{{RDF}}}nodeID"
+_RDF_RESOURCE = f"{{{RDF}}}resource"
+_RDF_PARSETYPE = f"{{{RDF}}}parseType"
+_RDF_TYPE_ATTR = f"{{{RDF}}}type"
+
+def _iri(tag: str) -> str:
+    '''Turn an lxml "{ns}local" tag or attribute name into a full IRI.'''
+    if tag[:1] != "{":
+        return tag
+    ns, _, local = tag[1:].partition("}")
+    # predicates/classes repeat on every node; keep one copy of each
+    return sys.intern(ns + local)
+
+def _resolve(elem, ref: str) -> str:
+    '''Resolve a (possibly relative) IRI reference against the element's xml:base.'''
+    base = elem.base
+    return sys.intern(urljoin(base, ref) if base else ref)
+
+def _has_supported_ext(path: str) -> bool:
+    '''Case-insensitive SUPPORTED_EXT suffix test; constant cost even for long literals.'''
+    return path[-_EXT_TAIL:].lower().endswith(SUPPORTED_EXT)
+
+def _is_blank(o: str) -> bool:
+    '''True if the index value denotes a blank node.'''
+    return o.startswith("_:")
+
+def _read_rdfxml(rdf_bytes: bytes) -> Index:
+    '''Stream RDF/XML with lxml and collect its triples into a subject index.
+
+    Handles typed node elements, rdf:Description, rdf:about/ID/nodeID,
+    nested and blank nodes, rdf:resource, property attributes and
+    rdf:parseType="Resource"/"Literal". Collections are parsed for their
+    member nodes but not linked as rdf:List.
+
+    Args:
+        rdf_bytes: RDF/XML content as bytes.
+
+    Returns:
+        Index mapping subject -> predicate -> list of objects.
+    '''
+    spo: Index = {}
+    bnodes = count()
+
+    def add(s: str, p: str, o: str):
+        objs = spo.setdefault(s, {}).setdefault(p, [])
+        if o not in objs:
+            objs.append(o)
+
+    def add_attrs(s: str, elem):
+        for name, value in elem.attrib.items():
+            if name == _RDF_TYPE_ATTR:
+                add(s, RDF_TYPE, _resolve(elem, value))
+            elif name[:1] == "{" and not name.startswith((f"{{{RDF}}}", f"{{{XML}}}")):
+                add(s, _iri(name), value)
+
+    # frames: ["root"] | ["node", s] | ["prop", s, p, has_object] | ["literal", s, p] | ["coll"] | ["skip"]
+    stack: List[list] = []
+    for event, elem in etree.iterparse(BytesIO(rdf_bytes), events=("start", "end"),
+                                       resolve_entities=False, remove_comments=True, remove_pis=True):
+        if event == "start":
+            kind = stack[-1][0] if stack else "root"
+            if kind in ("literal", "skip"):
+                stack.append(["skip"])
+            elif not stack and elem.tag == _RDF_RDF:
+                stack.append(["root"])
+            elif kind in ("root", "prop", "coll"):
+                # node element
+                if (ref := elem.get(_RDF_ABOUT)) is not None:
+                    s = _resolve(elem, ref)
+                elif (ref := elem.get(_RDF_ID)) is not None:
+                    s = _resolve(elem, "#" + ref)
+                elif (ref := elem.get(_RDF_NODEID)) is not None:
+                    s = "_:" + ref
+                else:
+                    s = f"_:~{next(bnodes)}"
+                if elem.tag != _RDF_DESCRIPTION:
+                    add(s, RDF_TYPE, _iri(elem.tag))
+                add_attrs(s, elem)
+                if kind == "prop":
+                    parent = stack[-1]
+                    add(parent[1], parent[2], s)
+                    parent[3] = True
+                spo.setdefault(s, {})
+                stack.append(["node", s])
+            else:
+                # property element
+                s, p = stack[-1][1], _iri(elem.tag)
+                parse_type = elem.get(_RDF_PARSETYPE)
+                if parse_type == "Resource":
+                    b = f"_:~{next(bnodes)}"
+                    add(s, p, b)
+                    stack.append(["node", b])
+                elif parse_type == "Literal":
+                    stack.append(["literal", s, p])
+                elif parse_type == "Collection":
+                    stack.append(["coll"])
+                else:
+                    if (ref := elem.get(_RDF_RESOURCE)) is not None:
+                        o = _resolve(elem, ref)
+                    elif (ref := elem.get(_RDF_NODEID)) is not None:
+                        o = "_:" + ref
+                    elif any(n[:1] == "{" and not n.startswith((f"{{{RDF}}}", f"{{{XML}}}")) for n in elem.attrib):
+                        o = f"_:~{next(bnodes)}"
+                    else:
+                        o = None
+                    if o is not None:
+                        add(s, p, o)
+                        add_attrs(o, elem)
+                    stack.append(["prop", s, p, o is not None])
+        else:
+            frame = stack.pop()
+            if frame[0] == "prop" and not frame[3]:
+                add(frame[1], frame[2], elem.text or "")
+            elif frame[0] == "literal":
+                inner = [elem.text or ""]
+                for child in elem:
+                    child = deepcopy(child)
+                    etree.cleanup_namespaces(child)  # drop inherited xmlns declarations
+                    inner.append(etree.tostring(child, encoding="unicode"))
+                add(frame[1], frame[2], "".join(inner))
+            elif frame[0] == "node":
+                elem.clear()
+                if stack and stack[-1][0] == "root":
+                    # top-level node done: drop it and earlier siblings from the tree
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+    return spo
+
+def _one(po: Dict[str, List[str]], p) -> Optional[str]:
+    '''Return the first object for predicate p as string, or None.
 
-def _one(g: Graph, s, p) -> Optional[str]:
-    '''Return the first object for subject s and predicate p as string, or None.
-    
     Args:
-        g: RDF graph
-        s: subject
+        po: predicate -> objects of one subject (an entry of the index)
         p: predicate
-    
+
     Returns:
         The first object as string, or None if not found.
     '''
-    o = next(g.objects(s, p), None)
-    return str(o) if o is not None else None
+    objs = po.get(p)
+    return objs[0] if objs else None
+
+def _many(po: Dict[str, List[str]], p) -> List[str]:
+    '''Return all objects for predicate p as strings.
 
-def _many(g: Graph, s, p) -> List[str]:
-    '''Return all objects for subject s and predicate p as strings.
-    
     Args:
-        g: RDF graph
-        s: subject
+        po: predicate -> objects of one subject (an entry of the index)
         p: predicate
-    
+
     Returns:
         List of objects as strings.
     '''
 
-    return [str(o) for o in g.objects(s, p)]
+    return list(po.get(p, ()))
+
+def _invert(spo: Index) -> Dict[str, Dict[str, List[str]]]:
+    '''Build the predicate -> object -> subjects index from a subject index.
+
+    Subjects keep the order in which they appear in spo.
+
+    Args:
+        spo: subject index
+
+    Returns:
+        Index mapping predicate -> object -> list of subjects.
+    '''
+    pos: Dict[str, Dict[str, List[str]]] = {}
+    for s, po in spo.items():
+        for p, objs in po.items():
+            by_obj = pos.setdefault(p, {})
+            for o in objs:
+                by_obj.setdefault(o, []).append(s)
+    return pos
+
+def _subjects(pos: Dict[str, Dict[str, List[str]]], p, o) -> List[str]:
+    '''Return all subjects that have object o for predicate p.
+
+    Args:
+        pos: predicate index (see _invert)
+        p: predicate
+        o: object
+
+    Returns:
+        List of subjects.
+    '''
+    return pos.get(p, {}).get(o, [])
 
 def parse_metadata_rdf(rdf_bytes: bytes) -> Dict:
     '''Parse RDF metadata from IIRDS package RDF/XML content.
-    
+
     Args:
         rdf_bytes: RDF/XML content as bytes.
 
@@ -50,8 +270,21 @@ def parse_metadata_rdf(rdf_bytes: bytes) -> Dict:
             "renditions": [ {...}, ... ]
         }
     '''
-    g = Graph()
-    g.parse(data=rdf_bytes, format="xml")
+    cache_file = None
+    if RDF_CACHE_DIR:
+        key = blake3.blake3(_CACHE_VERSION + b"|" + rdf_bytes).hexdigest(16)
+        cache_file = os.path.join(RDF_CACHE_DIR, _CACHE_PREFIX + key + ".json")
+        try:
+            with open(cache_file, "rb") as f:
+                cached = orjson.loads(f.read())
+            # mtime marks recent use for eviction
+            os.utime(cache_file)
+            return cached
+        except (OSError, orjson.JSONDecodeError):
+            pass
+
+    spo = _read_rdfxml(rdf_bytes)
+    pos = _invert(spo)
 
     data = {
         "package": None,
@@ -61,102 +294,155 @@ def parse_metadata_rdf(rdf_bytes: bytes) -> Dict:
     }
 
     # Package
-    for s in g.subjects(RDF.type, IIRDS.Package):
-        data["package"] = {"iri": str(s)}
+    for s in _subjects(pos, RDF_TYPE, T_PACKAGE):
+        data["package"] = {"iri": s}
         break
 
     # Collect IUs
-    for iu in g.subjects(RDF.type, IIRDS.Document):
-        data["documents"].append(_extract_iu(g, iu, is_topic=False))
-    for iu in g.subjects(RDF.type, IIRDS.Topic):
-        data["topics"].append(_extract_iu(g, iu, is_topic=True))
+    jobs = [(iu, False) for iu in _subjects(pos, RDF_TYPE, T_DOCUMENT)]
+    jobs += [(iu, True) for iu in _subjects(pos, RDF_TYPE, T_TOPIC)]
+    ius = [_extract_iu(spo, iu, is_topic) for iu, is_topic in jobs]
+    for iu in ius:
+        data["topics" if iu["kind"] == "Topic" else "documents"].append(iu)
 
     seen = set()
+    has_rendition = set()
 
     # Renditions --------------------------------------------------------------
-    def add_rendition(parent_iri: str, src: Optional[str], fmt: Optional[str]):
+    def add_rendition(parent_iri: str, src: Optional[str], fmt: Optional[str], ext_checked: bool = False):
         if not src:
             return
-        s = src.lower()
-        if not any(s.endswith(ext) for ext in SUPPORTED_EXT):
+        if not ext_checked and not _has_supported_ext(src):
             return
         key = (parent_iri, src, fmt)
         if key in seen:
             return        # <--- skip duplicates
         seen.add(key)
+        has_rendition.add(parent_iri)
         data["renditions"].append({
             "parent_iri": parent_iri,
             "source_path": src,
             "format": fmt
         })
 
-    # helpers for both vocab styles
-    P_HAS_RENDITION = [IIRDS["has-rendition"], IIRDS.hasRendition, IIRDS.Rendition]
-    P_SOURCE = [IIRDS["source"], IIRDS.Source, DCTERMS.source]
-    P_FORMAT = [IIRDS["format"], IIRDS.Format, DCTERMS.format]
-    P_CONTENT_REF = [IIRDS["contentReference"], IIRDS.contentReference]
-
     # 1) Explicit rendition nodes
-    for r in g.subjects(RDF.type, IIRDS.Rendition):
-        fmt = (_first_of(g, r, P_FORMAT) or None)
-        src = (_first_of(g, r, P_CONTENT_REF + P_SOURCE) or None)
+    for r in _subjects(pos, RDF_TYPE, T_RENDITION):
+        r_po = spo.get(r, {})
+        fmt = (_first_of(r_po, P_FORMAT) or None)
+        src = (_first_of(r_po, P_SOURCE_CONTENT) or None)
         # find parent IU via common preds
-        for parent_pred in [IIRDS["has-rendition"], IIRDS.hasRendition, IIRDS.Rendition]:
-            for parent in g.subjects(parent_pred, r):
-                if (parent, RDF.type, IIRDS.Topic) in g or (parent, RDF.type, IIRDS.Document) in g:
-                    add_rendition(str(parent), src, fmt)
+        for parent_pred in P_HAS_RENDITION:
+            for parent in _subjects(pos, parent_pred, r):
+                parent_types = spo.get(parent, {}).get(RDF_TYPE, ())
+                if T_TOPIC in parent_types or T_DOCUMENT in parent_types:
+                    add_rendition(parent, src, fmt)
 
     # 2) Property-based rendition on IU + forgiving fallback
     all_ius = [*(d["iri"] for d in data["documents"]), *(t["iri"] for t in data["topics"])]
     for iri in all_ius:
-        iu = URIRef(iri)
+        iu_po = spo.get(iri, {})
 
         # IU → rendition node
         for p in P_HAS_RENDITION:
-            for r in g.objects(iu, p):
-                fmt = (_first_of(g, r, P_FORMAT) or None)
-                src = (_first_of(g, r, P_CONTENT_REF + P_SOURCE) or None)
+            for r in iu_po.get(p, ()):
+                r_po = spo.get(r, {})
+                fmt = (_first_of(r_po, P_FORMAT) or None)
+                src = (_first_of(r_po, P_SOURCE_CONTENT) or None)
                 add_rendition(iri, src, fmt)
 
         # IU → direct content path
-        for p in (P_CONTENT_REF + P_SOURCE):
-            for o in g.objects(iu, p):
-                add_rendition(iri, str(o), None)
-
-        # fallback: any predicate value that looks like a file path
-        for p, o in g.predicate_objects(iu):
-            if isinstance(o, (URIRef, Literal)):
-                s = str(o)
-                ls = s.lower()
-                if any(ls.endswith(ext) for ext in SUPPORTED_EXT):
-                    add_rendition(iri, s, None)
+        for p in P_SOURCE_CONTENT:
+            for o in iu_po.get(p, ()):
+                add_rendition(iri, o, None)
+
+        # fallback: any predicate value that looks like a file path,
+        # only for IUs the explicit passes found nothing for
+        if iri in has_rendition:
+            continue
+        for objs in iu_po.values():
+            for o in objs:
+                if not _is_blank(o) and _has_supported_ext(o):
+                    add_rendition(iri, o, None, ext_checked=True)
 
     print(f"[rdf_extract] docs={len(data['documents'])} topics={len(data['topics'])} renditions={len(data['renditions'])}")
+    if cache_file:
+        _write_cache(cache_file, data)
     return data
 
-def _first_of(g: Graph, s, preds: List) -> Optional[str]:
+def _write_cache(path: str, data: Dict):
+    '''Store parsed metadata atomically; failures only cost the cache.'''
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(data))
+        os.replace(tmp, path)
+        _prune_cache(os.path.dirname(path))
+    except OSError:
+        pass
+
+def _prune_cache(cache_dir: str):
+    '''Delete cache entries of other versions and all but the RDF_CACHE_MAX_ENTRIES most recently used.'''
+    current = []
+    with os.scandir(cache_dir) as it:
+        for e in it:
+            if not e.name.endswith(".json"):
+                continue
+            if e.name.startswith(_CACHE_PREFIX):
+                current.append((e.stat().st_mtime, e.path))
+            else:
+                _remove_quietly(e.path)
+    if len(current) > RDF_CACHE_MAX_ENTRIES:
+        current.sort()
+        for _, path in current[:len(current) - RDF_CACHE_MAX_ENTRIES]:
+            _remove_quietly(path)
+
+def _remove_quietly(path: str):
+    '''Remove a file, ignoring one already removed by a concurrent prune.'''
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _first_of(po: Dict[str, List[str]], preds: List) -> Optional[str]:
     '''
-    Return the first object as string for subject s and any of the predicates in preds.
+    Return the first object as string for any of the predicates in preds.
 
     Args:
-        g: RDF graph
-        s: subject
+        po: predicate -> objects of one subject (an entry of the index)
         preds: list of predicates
 
     Returns:
         The first object as string, or None if not found.
     '''
     for p in preds:
-        val = _one(g, s, p)
+        val = _one(po, p)
         if val:
             return val
     return None
 
-def _extract_iu(g: Graph, iu, is_topic: bool) -> Dict:
+def _first_many(po: Dict[str, List[str]], preds) -> List[str]:
+    '''
+    Return all objects of the first predicate in preds that has any.
+
+    Args:
+        po: predicate -> objects of one subject (an entry of the index)
+        preds: predicates in order of preference
+
+    Returns:
+        List of objects as strings (empty if none of the predicates is set).
+    '''
+    for p in preds:
+        objs = po.get(p)
+        if objs:
+            return list(objs)
+    return []
+
+def _extract_iu(spo: Index, iu, is_topic: bool) -> Dict:
     '''Extract metadata for a Document or Topic information unit.
     Args:
-        g: RDF graph
-        iu: subject URIRef
+        spo: subject index
+        iu: subject IRI
         is_topic: True if the IU is a Topic, False if Document
 
     Returns:
@@ -175,26 +461,14 @@ def _extract_iu(g: Graph, iu, is_topic: bool) -> Dict:
             "kind": "Topic" | "Document"
         }
     '''
-    # labels/titles/language
-    label = (_one(g, iu, RDFS.label) or _one(g, iu, DCTERMS.title) or _one(g, iu, DC.title))
-    language = (_one(g, iu, IIRDS["language"]) or _one(g, iu, DCTERMS.language) or _one(g, iu, DC.language))
-
-    # status (optional)
-    status_val  = _one(g, iu, IIRDS["has-content-lifecycle-status-value"]) or _one(g, iu, IIRDS.InformationUnitLifecycleStatusValue)
-    status_date = _one(g, iu, IIRDS["dateOfStatus"]) or _one(g, iu, IIRDS.InformationUnitLifecycleStatusDate)
-
-    # Attributes via modern, hyphenated predicates (fall back to legacy)
-    doc_types  = _many(g, iu, IIRDS["is-applicable-for-document-type"]) or _many(g, iu, IIRDS.DocumentType)
-    variants   = _many(g, iu, IIRDS["relates-to-product-variant"])     or _many(g, iu, IIRDS.ProductVariant)
-    components = _many(g, iu, IIRDS["relates-to-component"])           or _many(g, iu, IIRDS.Component)
-    roles      = _many(g, iu, IIRDS["relates-to-qualification"])       or _many(g, iu, IIRDS.hasRole)
-    subjects   = _many(g, iu, IIRDS["has-subject"])                    or _many(g, iu, IIRDS.Subject)
-    phases     = _many(g, iu, IIRDS["relates-to-product-lifecycle-phase"]) or _many(g, iu, IIRDS.ProductLifecyclePhase)
+    # all predicates of the IU, looked up once
+    po = spo.get(iu, {})
+    scalars = {field: _first_of(po, preds) for field, preds in IU_SCALAR_PREDS.items()}
+    lists = {field: _first_many(po, preds) for field, preds in IU_LIST_PREDS.items()}
 
     return {
-        "iri": str(iu), "label": label, "language": language,
-        "doc_types": doc_types, "product_variants": variants, "components": components,
-        "roles": roles, "subjects": subjects, "phases": phases,
-        "status": {"value": status_val, "date": status_date},
+        "iri": iu, "label": scalars["label"], "language": scalars["language"],
+        **lists,
+        "status": {"value": scalars["status_value"], "date": scalars["status_date"]},
         "kind": "Topic" if is_topic else "Document",
     }
@@ -4,15 +4,20 @@ from typing import Dict
 
 IIRDS = Namespace("http://iirds.tekom.de/iirds#")
 
-def _first_str(g, subj, pred):
-    for o in g.objects(subj, pred):
-        return str(o)
-    return None
+def _bucket(g, subj):
+    po = {}
+    for p, o in g.predicate_objects(subj):
+        po.setdefault(p, []).append(o)
+    return po
 
-def _vals_any(g, subj, preds):
+def _first_str(po, pred):
+    objs = po.get(pred)
+    return str(objs[0]) if objs else None
+
+def _vals_any(po, preds):
     vals = []
     for p in preds:
-        vals.extend(str(o) for o in g.objects(subj, p))
+        vals.extend(str(o) for o in po.get(p, ()))
     return list(dict.fromkeys(vals))
 
 def parse_metadata_rdf(rdf_bytes: bytes) -> Dict:
@@ -34,15 +39,17 @@ def parse_metadata_rdf(rdf_bytes: bytes) -> Dict:
         data["topics"].append(_extract_information_unit(g, iu, is_topic=True))
 
     def add_rendition(parent_iri, rnode):
-        src = _first_str(g, rnode, IIRDS.Source) or _first_str(g, rnode, DCTERMS.source)
-        fmt = _first_str(g, rnode, IIRDS.Format)
+        r_po = _bucket(g, rnode)
+        src = _first_str(r_po, IIRDS.Source) or _first_str(r_po, DCTERMS.source)
+        fmt = _first_str(r_po, IIRDS.Format)
         if src:
             data["renditions"].append({"parent_iri": str(parent_iri), "source_path": str(src), "format": str(fmt) if fmt else None})
 
     for iu in [*data["documents"], *data["topics"]]:
         subj = URIRef(iu["iri"])
+        iu_po = _bucket(g, subj)
         for p in (IIRDS.Rendition, IIRDS.hasRendition):
-            for r in g.objects(subj, p):
+            for r in iu_po.get(p, ()):
                 add_rendition(subj, r)
 
     for r in g.subjects(RDF.type, IIRDS.Rendition):
@@ -53,17 +60,18 @@ def parse_metadata_rdf(rdf_bytes: bytes) -> Dict:
     return data
 
 def _extract_information_unit(g: Graph, iu, is_topic: bool) -> Dict:
-    label = _first_str(g, iu, RDFS.label) or _first_str(g, iu, DCTERMS.title) or _first_str(g, iu, DC.title)
-    language = _first_str(g, iu, IIRDS.Language) or _first_str(g, iu, DCTERMS.language) or _first_str(g, iu, DC.language)
-    status_val  = _first_str(g, iu, IIRDS.InformationUnitLifecycleStatusValue)
-    status_date = _first_str(g, iu, IIRDS.InformationUnitLifecycleStatusDate)
+    po = _bucket(g, iu)
+    label = _first_str(po, RDFS.label) or _first_str(po, DCTERMS.title) or _first_str(po, DC.title)
+    language = _first_str(po, IIRDS.Language) or _first_str(po, DCTERMS.language) or _first_str(po, DC.language)
+    status_val  = _first_str(po, IIRDS.InformationUnitLifecycleStatusValue)
+    status_date = _first_str(po, IIRDS.InformationUnitLifecycleStatusDate)
 
-    doc_types  = _vals_any(g, iu, [IIRDS.DocumentType])
-    variants   = _vals_any(g, iu, [IIRDS.ProductVariant])
-    components = _vals_any(g, iu, [IIRDS.Component])
-    roles      = _vals_any(g, iu, [IIRDS.Role, IIRDS.hasRole])
-    subjects   = _vals_any(g, iu, [IIRDS.Subject, IIRDS.hasSubject])
-    phases     = _vals_any(g, iu, [IIRDS.ProductLifecyclePhase])
+    doc_types  = _vals_any(po, [IIRDS.DocumentType])
+    variants   = _vals_any(po, [IIRDS.ProductVariant])
+    components = _vals_any(po, [IIRDS.Component])
+    roles      = _vals_any(po, [IIRDS.Role, IIRDS.hasRole])
+    subjects   = _vals_any(po, [IIRDS.Subject, IIRDS.hasSubject])
+    phases     = _vals_any(po, [IIRDS.ProductLifecyclePhase])
 
     return {
         "iri": str(iu), "label": label, "language": language,
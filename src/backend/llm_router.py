@@ -1,5 +1,7 @@
 # backend/llm_router.py
 import os
+import threading
+from collections import OrderedDict
 from typing import Optional
 from langchain_openai import ChatOpenAI
 
@@ -19,6 +21,33 @@ class LLMRouter:
         self._local_llm  = ChatOpenAI(model=self.local_model,  api_key="ollama", base_url=self.local_base)
         self._remote_llm = ChatOpenAI(model=self.remote_model, api_key=self.remote_key, base_url=self.remote_base) if self.remote_key else None
 
+        # override clients, reused so their HTTP connection pools stay warm
+        self._override_cache_size = int(os.getenv("LLM_CLIENT_CACHE_SIZE", "8"))
+        self._override_llms: "OrderedDict[tuple, ChatOpenAI]" = OrderedDict()
+        self._override_lock = threading.Lock()
+
+    def _override(self, mode: str, model: str, api_key: str, base_url: str) -> ChatOpenAI:
+        '''Return a cached client for an overridden model, creating it on first use.
+
+        Args:
+            mode: "local" or "remote".
+            model: Model name.
+            api_key: API key for the endpoint.
+            base_url: Base URL of the endpoint.
+        Returns:
+            An instance of ChatOpenAI for the model.
+        '''
+        key = (mode, model)
+        with self._override_lock:
+            llm = self._override_llms.get(key)
+            if llm is None:
+                llm = self._override_llms[key] = ChatOpenAI(model=model, api_key=api_key, base_url=base_url)
+                if len(self._override_llms) > self._override_cache_size:
+                    self._override_llms.popitem(last=False)
+            else:
+                self._override_llms.move_to_end(key)
+            return llm
+
     def pick(self, mode: str = "local", model_override: Optional[str] = None) -> ChatOpenAI:
         '''Pick an LLM based on mode and optional model override.
 
@@ -31,14 +60,14 @@ class LLMRouter:
         m = (mode or "local").lower()
         if m == "local":
             if model_override and model_override != self.local_model:
-                return ChatOpenAI(model=model_override, api_key="ollama", base_url=self.local_base)
+                return self._override("local", model_override, "ollama", self.local_base)
             return self._local_llm
 
         if m == "remote":
             if not self._remote_llm:
                 raise RuntimeError("Remote LLM not configured (missing OPENROUTER_API_KEY).")
             if model_override and model_override != self.remote_model:
-                return ChatOpenAI(model=model_override, api_key=self.remote_key, base_url=self.remote_base)
+                return self._override("remote", model_override, self.remote_key, self.remote_base)
             return self._remote_llm
 
         # auto: prefer remote if configured
@@ -3,10 +3,14 @@
 Provides endpoints for health check, document ingestion, and querying.
 '''
 import os
+import orjson
+import shutil
+import tempfile
 from fastapi import FastAPI, UploadFile, File, HTTPException, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 import logging
-from backend.rag.chroma_store import ChromaStore
+from backend.rag.chroma_store import ChromaStore, make_preview
 from backend.rag.neo4j_store import Neo4jStore
 from backend.iirds.ingest import IirdsIngestor
 from backend.rag.pipeline import IirdsRagPipeline
@@ -23,10 +27,18 @@ logging.basicConfig(
     level=LOG_LEVEL,
     format="%(asctime)s | %(levelname)s | %(name)s | %(message)s"
 )
+log = logging.getLogger("api")
+
+# kept identical across requests so providers can reuse the cached prompt prefix
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a technical documentation assistant.\n"
+    "Use ONLY the supplied Context to answer. If the Context is empty or insufficient, reply with 'NO_CONTEXT'.\n"
+    "Add short citations as (parent_iri | path)."
+)
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-app = FastAPI(title="iiRDS RAG API")
+app = FastAPI(title="iiRDS RAG API", default_response_class=ORJSONResponse)
 
 # stores & pipeline
 chroma = ChromaStore(path=CHROMA_PATH)
@@ -46,6 +58,7 @@ class QueryPayload(BaseModel):
     max_tokens: int | None = None
     system_prompt: str | None = None
     debug: bool = False  
+    stream: bool = False
 
 @app.get("/health")
 def health():
@@ -53,31 +66,43 @@ def health():
     return {"status": "ok"}
 
 @app.post("/ingest")
-async def ingest(file: UploadFile = File(...)):
-    '''Ingest an iiRDS ZIP package.'''
+def ingest(file: UploadFile = File(...)):
+    '''Ingest an iiRDS ZIP package.
+
+    A plain def, so FastAPI runs the blocking copy and ingest in its threadpool
+    and the event loop keeps serving /query and /health meanwhile.
+    '''
+    # stream the upload to disk in 1 MiB pieces and ingest from there, so the
+    # package is never held in memory as a whole; the file name is unique per
+    # request so concurrent uploads of the same package can't overwrite each other
+    fd, tmp = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
     try:
-        blob = await file.read()
-        # optional: keep a copy of uploaded file
-        try:
-            with open(os.path.join(UPLOAD_DIR, file.filename), "wb") as f:
-                f.write(blob)
-        except Exception:
-            pass
-
-        stats = ingestor.ingest_zip_bytes(blob, file.filename)
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(file.file, f, 1 << 20)
+
+        stats = ingestor.ingest_zip_path(tmp, file.filename)
+
+        # optional: keep a copy of uploaded file under its own name
+        name = os.path.basename(file.filename or "")
+        if name:
+            try:
+                os.replace(tmp, os.path.join(UPLOAD_DIR, name))
+            except OSError:
+                pass
         return {"status": "ok", **stats}
     except KeyError as e:
         raise HTTPException(400, f"Bad package: {e}")
     except Exception as e:
-        import traceback
-        print("🔥 INGEST ERROR 🔥")
-        traceback.print_exc()            # <-- add this to print full stack trace
+        log.exception("ingest failed")
         raise HTTPException(500, f"Ingest failed: {e}")
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
 @app.post("/query")
 async def query(payload: QueryPayload, response: Response):
     '''Query endpoint to answer questions using RAG.'''
-    ctx, cites, hits = pipeline.answer_context(
+    ctx, cites, hits = await pipeline.aanswer_context(
         payload.question, filters=payload.filters, k=8, return_hits=True  # ← return hits
     )
 
@@ -85,13 +110,8 @@ async def query(payload: QueryPayload, response: Response):
     rag_used = bool(hits)
     response.headers["X-RAG-Used"] = "true" if rag_used else "false"
 
-    system_text = payload.system_prompt or (
-        "You are a technical documentation assistant.\n"
-        "Use ONLY the supplied Context to answer. If the Context is empty or insufficient, reply with 'NO_CONTEXT'.\n"
-        "Add short citations as (parent_iri | path)."
-    )
     messages = [
-        {"role": "system", "content": system_text},
+        {"role": "system", "content": payload.system_prompt or DEFAULT_SYSTEM_PROMPT},
         {"role": "user", "content": f"Context:\n{ctx}\n\nQuestion: {payload.question}"},
     ]
 
@@ -100,10 +120,7 @@ async def query(payload: QueryPayload, response: Response):
     except RuntimeError as e:
         raise HTTPException(400, str(e))
 
-    resp = llm.invoke(messages, temperature=payload.temperature, max_tokens=payload.max_tokens)
-
     out = {
-        "answer": resp.content,
         "citations": cites,
         "used_mode": payload.mode,
         "used_model": payload.model or (llm_router.remote_model if payload.mode == "remote" else llm_router.local_model),
@@ -116,14 +133,32 @@ async def query(payload: QueryPayload, response: Response):
             "ctx_chars": len(ctx),
             "retrieved": [
                 {
-                    "id": h["id"],
-                    "distance": h.get("distance"),
-                    "parent_iri": h["metadata"].get("parent_iri"),
-                    "path": h["metadata"].get("path"),
-                    "text_preview": (h["text"][:240] + "…") if h["text"] else "",
+                    "id": h.id,
+                    "distance": h.distance,
+                    "parent_iri": h.metadata.get("parent_iri"),
+                    "path": h.metadata.get("path"),
+                    "text_preview": make_preview(h.text or ""),
                 } for h in hits
             ],
             "filters": payload.filters,
         }
 
-    return out
+    if payload.stream:
+        # NDJSON: one metadata line, then one line per generated token
+        # (a failure after the first line can't change the status code any more,
+        # so it is reported as a final {"error": ...} line instead)
+        def gen():
+            yield orjson.dumps(out) + b"\n"
+            try:
+                for chunk in llm.stream(messages, temperature=payload.temperature, max_tokens=payload.max_tokens):
+                    if chunk.content:
+                        yield orjson.dumps({"token": chunk.content}) + b"\n"
+            except Exception as e:
+                log.exception("query stream failed")
+                yield orjson.dumps({"error": f"LLM call failed: {e}"}) + b"\n"
+
+        return StreamingResponse(gen(), media_type="application/x-ndjson",
+                                 headers={"X-RAG-Used": response.headers["X-RAG-Used"]})
+
+    resp = await llm.ainvoke(messages, temperature=payload.temperature, max_tokens=payload.max_tokens)
+    return {"answer": resp.content, **out}
@@ -1,9 +1,37 @@
 '''Chroma vector store interface for RAG.'''
 
+import os
+from functools import lru_cache
+from typing import NamedTuple, Optional
 from chromadb import PersistentClient
 import logging
 log = logging.getLogger("rag.chroma")
 
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+PREVIEW_CHARS = 240
+
+def make_preview(text: str) -> str:
+    '''Short preview of a chunk text for debug output.'''
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS] + "…"
+
+class Payload(NamedTuple):
+    '''One document to upsert.'''
+    id: str
+    text: str
+    metadata: dict
+
+class Hit(NamedTuple):
+    '''One search result.'''
+    id: str
+    text: str
+    metadata: dict
+    distance: Optional[float]
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _embed_query(query: str, embed_fn) -> tuple:
+    '''Embed a single query string; cached per (query, embedder) so repeated questions skip Ollama.'''
+    return tuple(embed_fn([query])[0])
+
 class ChromaStore:
     def __init__(self, path="/data/chroma", collection="iirds"):
         '''Initialize ChromaStore with persistent client and collection.
@@ -21,21 +49,59 @@ class ChromaStore:
     def upsert(self, payloads, embed_fn):
         '''Upsert payloads into the Chroma collection.
         
+        Payloads with empty text are skipped. Each distinct text is sent to
+        embed_fn once and its vector shared by all duplicates.
+
         Args:
-            payloads: List of payload dictionaries with "id", "text", and "metadata".
+            payloads: List of Payload tuples.
             embed_fn: Function to generate embeddings from texts.
 
         Returns:
             None
         '''
+        payloads = [p for p in payloads if p.text]
         if not payloads: return
-        ids = [p["id"] for p in payloads]
-        docs = [p["text"] for p in payloads]
-        metas = [p["metadata"] for p in payloads]
-        embs = embed_fn(docs)
+        ids = [p.id for p in payloads]
+        docs = [p.text for p in payloads]
+        metas = [p.metadata for p in payloads]
+        # boilerplate chunks repeat across renditions; embed each distinct text once
+        unique = list(dict.fromkeys(docs))
+        vectors = dict(zip(unique, embed_fn(unique)))
+        embs = [vectors[t] for t in docs]
         self.col.upsert(ids=ids, embeddings=embs, documents=docs, metadatas=metas)
 
-    def search(self, query: str, top_k: int, embed_fn, where: dict | None = None):
+    def delete_stale(self, where: dict, keep_ids):
+        '''Delete rows matching where whose id is not in keep_ids.
+
+        Args:
+            where: Chroma filter selecting a package's rows, e.g. {"package": iri}.
+            keep_ids: Ids written by the current ingest.
+
+        Returns:
+            None
+        '''
+        keep = set(keep_ids)
+        stale = [i for i in self.col.get(where=where, include=[])["ids"] if i not in keep]
+        if stale:
+            self.col.delete(ids=stale)
+
+    def clear_cache(self):
+        '''Drop all cached query embeddings, e.g. after switching the embedding model.'''
+        _embed_query.cache_clear()
+
+    def embed_query(self, query: str, embed_fn) -> list:
+        '''Embed a query string, reusing the cached vector for repeated questions.
+
+        Args:
+            query: Query string to embed.
+            embed_fn: Function to generate embeddings from texts.
+
+        Returns:
+            The query vector as a list of floats.
+        '''
+        return list(_embed_query(query, embed_fn))
+
+    def search(self, query: str, top_k: int, embed_fn, where: dict | None = None, query_embedding=None):
         '''Search the Chroma collection for similar documents.
 
         Args:
@@ -43,25 +109,21 @@ class ChromaStore:
             top_k: Number of top results to return.
             embed_fn: Function to generate embeddings from texts.
             where: Optional dictionary to filter results.
+            query_embedding: Optional precomputed vector for query; skips embed_fn.
 
         Returns:
-            List of search hits with "id", "text", "metadata", and "distance".
+            List of Hit tuples (id, text, metadata, distance).
         '''
         log.debug(f"chroma.search: top_k={top_k} where={where}")
-        qvec = embed_fn([query])[0]
+        qvec = query_embedding if query_embedding is not None else self.embed_query(query, embed_fn)
         kwargs = {"query_embeddings": [qvec], "n_results": top_k}
         if where:  # only include if non-empty / not None
             kwargs["where"] = where
         res = self.col.query(**kwargs)
-        n = len(res["ids"][0]) if res.get("ids") else 0
-        log.info(f"chroma.search: returned {n} hits")        
-        hits = []
-        distances = res.get("distances", [[None]])[0]
-        for i in range(len(res["ids"][0])):
-            hits.append({
-                "id": res["ids"][0][i],
-                "text": res["documents"][0][i],
-                "metadata": res["metadatas"][0][i],
-                "distance": distances[i]
-            })
-        return hits
+        if not res.get("ids") or not res["ids"][0]:
+            log.info("chroma.search: returned 0 hits")
+            return []
+        ids = res["ids"][0]
+        log.info(f"chroma.search: returned {len(ids)} hits")
+        distances = (res.get("distances") or [[None] * len(ids)])[0]
+        return list(map(Hit, ids, res["documents"][0], res["metadatas"][0], distances))
@@ -1,8 +1,40 @@
 '''Text chunking utility for RAG.'''
 
+import os
+from functools import lru_cache
 from typing import List, Tuple
 import re
 
+# BPE used to count tokens, e.g. "cl100k_base"; "" (default) counts whitespace-separated
+# words. tiktoken fetches the BPE file on first use unless TIKTOKEN_CACHE_DIR already holds it.
+CHUNK_ENCODING = os.getenv("CHUNK_ENCODING", "")
+
+_TOKEN = re.compile(r"\S+")
+
+@lru_cache(maxsize=1)
+def _encoding():
+    '''Load the tiktoken encoding once, or None if disabled.
+
+    A configured encoding that can't be loaded is an error rather than a silent
+    fallback, since chunk boundaries (and chunk ids) must not depend on the network.
+    '''
+    if not CHUNK_ENCODING:
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(CHUNK_ENCODING)
+    except Exception as e:
+        raise RuntimeError(f"chunking: tiktoken encoding {CHUNK_ENCODING!r} unavailable: {e}") from e
+
+def _token_spans(text: str) -> List[Tuple[int, int]]:
+    '''Return (start_char, end_char) of every token in text.'''
+    enc = _encoding()
+    if enc is None:
+        return [m.span() for m in _TOKEN.finditer(text)]
+    tokens = enc.encode(text, disallowed_special=())
+    _, starts = enc.decode_with_offsets(tokens)
+    return list(zip(starts, starts[1:] + [len(text)]))
+
 def chunk_text(text: str, target_tokens=250, overlap_tokens=40) -> List[Tuple[int,int,str]]:
     '''Chunk text into overlapping segments based on token count.
     
@@ -14,17 +46,22 @@ def chunk_text(text: str, target_tokens=250, overlap_tokens=40) -> List[Tuple[in
     Returns:
         List of tuples containing (start_char_index, end_char_index, chunk_text).
     '''
-    # simple token = whitespace split; replace with tiktoken if you prefer
-    words = text.split()
-    if not words: return []
+    # BPE tokens (whitespace words unless CHUNK_ENCODING is set); chunks are
+    # slices of the original text, so offsets point into it exactly
+    if not text: return []
+    spans = _token_spans(text)
+    n = len(spans)
+    if not n: return []
     step = max(1, target_tokens - overlap_tokens)
-    chunks, i = [], 0
-    start_idx = 0
-    while i < len(words):
-        end = min(len(words), i + target_tokens)
-        chunk_words = words[i:end]
-        chunk = " ".join(chunk_words)
-        chunks.append((start_idx, start_idx + len(chunk), chunk))
-        start_idx += len(chunk) + 1
-        i += step
+    chunks = []
+    for i in range(0, n, step):
+        start = spans[i][0]
+        end = spans[min(n, i + target_tokens) - 1][1]
+        # BPE tokens carry their leading whitespace; keep chunk edges on text
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            chunks.append((start, end, text[start:end]))
     return chunks
@@ -1,12 +1,23 @@
 '''Embedding utility for RAG. Uses Ollama to access local embedding models.'''
 
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
 from langchain_ollama import OllamaEmbeddings
 
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+
 
 # Use local embedding model via Ollama; adjust model name as needed
+@lru_cache(maxsize=1)
 def get_embedder():
-    '''Returns a function that takes a list of texts and returns their embeddings.'''
+    '''Returns a function that takes a list of texts and returns their embeddings.
+
+    The function is built once per process and shared by the ingestor and the
+    query pipeline, so they reuse one Ollama client and worker pool.
+    '''
     base = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
     model = (
         os.getenv("LOCAL_EMBEDDING_MODEL_NAME")
@@ -18,8 +29,15 @@ def get_embedder():
         base_url=base
     )
 
-    #def embed(texts):
-        # LangChain returns list of vectors for embed_documents
-    #    return emb.embed_documents(texts)
-    
-    return lambda texts: emb.embed_documents(texts)
+    pool = ThreadPoolExecutor(max_workers=EMBED_WORKERS, thread_name_prefix="embed")
+
+    def embed(texts):
+        # LangChain returns list of vectors for embed_documents; send fixed-size
+        # batches concurrently so HTTP round-trips to Ollama overlap
+        texts = list(texts)
+        if len(texts) <= EMBED_BATCH:
+            return emb.embed_documents(texts)
+        batches = [texts[i:i + EMBED_BATCH] for i in range(0, len(texts), EMBED_BATCH)]
+        return list(chain.from_iterable(pool.map(emb.embed_documents, batches)))
+
+    return embed
@@ -1,36 +1,210 @@
 # neo4j_store.py
 ''' Neo4j graph store for RAG backend '''
+import atexit
+import logging
+import os
+import threading
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable
 
+log = logging.getLogger("rag.neo4j")
+
+# rows per UNWIND statement
+NEO4J_BATCH_SIZE = int(os.getenv("NEO4J_BATCH_SIZE", "1000"))
+
+# rows per write transaction; larger inputs are committed in several transactions
+NEO4J_TX_ROWS = int(os.getenv("NEO4J_TX_ROWS", "20000"))
+
+# driver connection pool
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+NEO4J_CONNECTION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "15"))
+
+# find_parents results per filter set; dropped on every graph write
+FIND_PARENTS_CACHE_SIZE = int(os.getenv("FIND_PARENTS_CACHE_SIZE", "1024"))
+FIND_PARENTS_CACHE_TTL = float(os.getenv("FIND_PARENTS_CACHE_TTL", "300"))
+# upper bound on IRIs returned by one find_parents call
+FIND_PARENTS_MAX = int(os.getenv("FIND_PARENTS_MAX", "50000"))
+
+# IU field -> (related node label, relationship type)
+ATTR_RELS = (
+    ("doc_types", "DocType", "APPLIES_TO_DOCUMENT_TYPE"),
+    ("product_variants", "ProductVariant", "RELATES_TO_PRODUCT_VARIANT"),
+    ("components", "Component", "RELATES_TO_COMPONENT"),
+    ("roles", "Role", "HAS_ROLE"),
+    ("subjects", "Subject", "HAS_SUBJECT"),
+    ("phases", "LifecyclePhase", "HAS_LIFECYCLE_PHASE"),
+)
+
+# Cypher per label/relationship type, rendered once and reused; labels and types
+# can't be query parameters, so this keeps one fixed string (and one cached plan) each
+@lru_cache(maxsize=None)
+def _merge_iu_query(kind: str) -> str:
+    return f"""
+        UNWIND $rows AS row
+        MERGE (n:{kind} {{iri:row.iri}})
+        SET n.label=row.label, n.language=row.language,
+            n.status_value=row.status_value, n.status_date=row.status_date
+    """
+
+@lru_cache(maxsize=None)
+def _link_package_query(kind: str) -> str:
+    return f"""
+        MATCH (p:Package {{iri:$piri}})
+        UNWIND $iris AS iri
+        MATCH (n:{kind} {{iri:iri}})
+        MERGE (n)-[:PART_OF_PACKAGE]->(p)
+    """
+
+@lru_cache(maxsize=None)
+def _attach_query(kind: str, label: str, rel: str) -> str:
+    return f"""
+        UNWIND $rows AS row
+        MATCH (n:{kind} {{iri:row.src}})
+        MERGE (m:{label} {{iri:row.val}})
+        MERGE (n)-[:{rel}]->(m)
+    """
+
+@lru_cache(maxsize=None)
+def _rendition_query(kind) -> str:
+    # parents not among the package's IUs keep the old unlabeled MERGE
+    parent = f"x:{kind}" if kind else "x"
+    return f"""
+        UNWIND $rows AS row
+        MERGE ({parent} {{iri:row.parent}})
+        MERGE (r:Rendition {{source_path:row.src}})
+        SET r.format=row.fmt
+        MERGE (x)-[:HAS_RENDITION]->(r)
+    """
+
+@lru_cache(maxsize=None)
+def _stale_chunks_query(key: str) -> str:
+    # key is "package" or "source_zip"; property names can't be parameters
+    return f"""
+        MATCH (ch:Chunk {{{key}:$val}})
+        WHERE NOT ch.chunk_id IN $keep
+        WITH ch LIMIT $limit
+        DETACH DELETE ch
+        RETURN count(*) AS n
+    """
+
+@lru_cache(maxsize=None)
+def _chunk_query(kind) -> str:
+    # chunks whose parent kind is unknown keep the unlabeled MATCH
+    parent = f"n:{kind}" if kind else "n"
+    return f"""
+        UNWIND $rows AS c
+        MERGE (ch:Chunk {{chunk_id:c.chunk_id}})
+        SET ch.package=c.package, ch.source_zip=c.source_zip, ch.path=c.path, ch.start_char=c.start, ch.end_char=c.end
+        WITH ch, c
+        MATCH ({parent} {{iri:c.parent_iri}})
+        MERGE (ch)-[:DERIVED_FROM]->(n)
+    """
+
+# one existence test per facet instead of chained MATCHes (which multiply rows per
+# matching facet); every parameter is always bound and an empty list means no filter,
+# so a single fixed string (and plan) serves every filter combination.
+# Only IUs carry facet edges, so the label test keeps the scan off Chunk and facet nodes.
+# One row per IRI, streamed over Bolt, rather than one record holding the whole list.
+FIND_PARENTS_QUERY = (
+    "MATCH (n) WHERE (n:Document OR n:Topic) AND "
+    + " AND ".join(
+        f"(size(${field}) = 0 OR EXISTS {{ (n)-[:{rel}]->(x:{label}) WHERE x.iri IN ${field} }})"
+        for field, label, rel in ATTR_RELS
+    )
+    + " RETURN DISTINCT n.iri AS iri LIMIT $limit"
+)
+
+def _kinds(data):
+    '''Map each IU IRI in a package graph to its node label (Document/Topic).'''
+    return {node["iri"]: node["kind"] for node in data.get("documents", []) + data.get("topics", [])}
+
+def _batches(rows, size):
+    '''Yield rows in slices of size.'''
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
 class Neo4jStore:
-    def __init__(self, uri="bolt://neo4j:7687", user="neo4j", password="password"):
+    def __init__(self, uri="bolt://neo4j:7687", user="neo4j", password="password",
+                 batch_size=NEO4J_BATCH_SIZE, tx_rows=NEO4J_TX_ROWS,
+                 max_connection_pool_size=NEO4J_POOL_SIZE, connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+                 max_connection_lifetime=NEO4J_MAX_CONNECTION_LIFETIME, connection_timeout=NEO4J_CONNECTION_TIMEOUT):
         '''Initialize Neo4jStore with connection parameters and retry logic.
         
         Args:
             uri: Neo4j connection URI.
             user: Username for Neo4j authentication.
             password: Password for Neo4j authentication.
+            batch_size: Rows sent per UNWIND statement on writes.
+            tx_rows: Rows committed per write transaction for chunk links.
+            max_connection_pool_size: Maximum pooled connections.
+            connection_acquisition_timeout: Seconds to wait for a free pooled connection.
+            max_connection_lifetime: Seconds after which pooled connections are replaced.
+            connection_timeout: Seconds to wait when opening a new connection.
 
         Returns:
             None
         '''
-        # retry connect (e.g., 30s)
+        self.batch_size = batch_size
+        self.tx_rows = tx_rows
+        self.driver = GraphDatabase.driver(
+            uri, auth=(user, password),
+            max_connection_pool_size=max_connection_pool_size,
+            connection_acquisition_timeout=connection_acquisition_timeout,
+            max_connection_lifetime=max_connection_lifetime,
+            connection_timeout=connection_timeout,
+            keep_alive=True,
+        )
+        # retry connect (e.g., 30s) with exponential backoff
         deadline = time.time() + 30
-        last_err = None
-        while time.time() < deadline:
+        attempt = 0
+        while True:
             try:
-                self.driver = GraphDatabase.driver(uri, auth=(user, password))
                 # simple ping
                 with self.driver.session() as s:
                     s.run("RETURN 1").consume()
                 break
-            except ServiceUnavailable as e:
-                last_err = e
-                time.sleep(1)
-        if not hasattr(self, "driver"):
-            raise last_err or RuntimeError("Could not connect to Neo4j")
+            except ServiceUnavailable:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.driver.close()
+                    raise
+                time.sleep(min(2 ** attempt, 8, remaining))
+                attempt += 1
+        self._local = threading.local()
+        self._parents_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._parents_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def close(self):
+        '''Close the driver and its connection pool.'''
+        self.driver.close()
+
+    @contextmanager
+    def session(self):
+        '''Open a session, or reuse the one already open in this thread.
+
+        Nesting `with store.session()` blocks (or calling store methods inside
+        one) runs every query on the same session and connection.
+
+        Yields:
+            Neo4j session.
+        '''
+        s = getattr(self._local, "session", None)
+        if s is not None:
+            yield s
+            return
+        with self.driver.session() as s:
+            self._local.session = s
+            try:
+                yield s
+            finally:
+                self._local.session = None
 
     def ensure_constraints(self):
         '''Ensure uniqueness constraints exist in the Neo4j database.'''
@@ -40,13 +214,23 @@ class Neo4jStore:
             "CREATE CONSTRAINT topic_iri IF NOT EXISTS FOR (n:Topic)     REQUIRE n.iri IS UNIQUE",
             "CREATE CONSTRAINT rend_src  IF NOT EXISTS FOR (r:Rendition) REQUIRE r.source_path IS UNIQUE",
             "CREATE CONSTRAINT chunk_id  IF NOT EXISTS FOR (c:Chunk)     REQUIRE c.chunk_id IS UNIQUE",
+            # stale-chunk cleanup on re-ingest looks chunks up by package, else by ZIP name
+            "CREATE INDEX chunk_pkg      IF NOT EXISTS FOR (c:Chunk)     ON (c.package)",
+            "CREATE INDEX chunk_zip      IF NOT EXISTS FOR (c:Chunk)     ON (c.source_zip)",
+            # facet nodes: one node per facet IRI, and an index for MERGE/MATCH by iri on ingest
+            "CREATE CONSTRAINT pv_iri    IF NOT EXISTS FOR (n:ProductVariant) REQUIRE n.iri IS UNIQUE",
+            "CREATE CONSTRAINT comp_iri  IF NOT EXISTS FOR (n:Component)      REQUIRE n.iri IS UNIQUE",
+            "CREATE CONSTRAINT role_iri  IF NOT EXISTS FOR (n:Role)           REQUIRE n.iri IS UNIQUE",
+            "CREATE CONSTRAINT dtype_iri IF NOT EXISTS FOR (n:DocType)        REQUIRE n.iri IS UNIQUE",
+            "CREATE CONSTRAINT subj_iri  IF NOT EXISTS FOR (n:Subject)        REQUIRE n.iri IS UNIQUE",
+            "CREATE CONSTRAINT phase_iri IF NOT EXISTS FOR (n:LifecyclePhase) REQUIRE n.iri IS UNIQUE",
         ]
-        with self.driver.session() as s:
+        with self.session() as s:
             for q in stmts:
-                s.run(q)
+                s.execute_write(lambda tx: tx.run(q).consume())
 
     def upsert_graph(self, data):
-        '''Upsert nodes and relationships into the Neo4j graph database.
+        '''Upsert nodes and relationships into the Neo4j graph database in one transaction.
         
         Args:
             data: Dictionary containing package, documents, topics, and renditions.
@@ -54,140 +238,173 @@ class Neo4jStore:
         Returns:
             None
         '''
-        with self.driver.session() as s:
-            if data.get("package"):
-                s.run("MERGE (p:Package {iri:$iri})", iri=data["package"]["iri"])
-
-            for node in data.get("documents", []) + data.get("topics", []):
-                s.run(f"""
-                    MERGE (n:{node["kind"]} {{iri:$iri}})
-                    SET n.label=$label, n.language=$language, n.status_value=$status_value, n.status_date=$status_date
-                """, iri=node["iri"], label=node.get("label"), language=node.get("language"),
-                     status_value=(node.get("status") or {}).get("value"),
-                     status_date=(node.get("status") or {}).get("date"))
-
-                if data.get("package"):
-                    s.run("""
-                        MATCH (n {iri:$iri}), (p:Package {iri:$piri})
-                        MERGE (n)-[:PART_OF_PACKAGE]->(p)
-                    """, iri=node["iri"], piri=data["package"]["iri"])
-
-                self._attach_array(s, node["iri"], node.get("doc_types", []), "DocType", "APPLIES_TO_DOCUMENT_TYPE")
-                self._attach_array(s, node["iri"], node.get("product_variants", []), "ProductVariant", "RELATES_TO_PRODUCT_VARIANT")
-                self._attach_array(s, node["iri"], node.get("components", []), "Component", "RELATES_TO_COMPONENT")
-                self._attach_array(s, node["iri"], node.get("roles", []), "Role", "HAS_ROLE")
-                self._attach_array(s, node["iri"], node.get("subjects", []), "Subject", "HAS_SUBJECT")
-                self._attach_array(s, node["iri"], node.get("phases", []), "LifecyclePhase", "HAS_LIFECYCLE_PHASE")
-
-            for r in data.get("renditions", []):
-                s.run("""
-                    MERGE (x {iri:$parent})
-                    MERGE (r:Rendition {source_path:$src})
-                    SET r.format=$fmt
-                    MERGE (x)-[:HAS_RENDITION]->(r)
-                """, parent=r["parent_iri"], src=r["source_path"], fmt=r.get("format"))
-
-    def _attach_array(self, s, iri, values, label, rel):
-        '''Attach array of related nodes to a node via relationships.
-        
-        Args:
-            s: Neo4j session.
-            iri: IRI of the source node.
-            values: List of IRIs for related nodes.
-            label: Label of the related nodes.
-            rel: Relationship type.
+        with self.session() as s:
+            s.execute_write(self._write_graph, data)
+        self.clear_cache()
+
+    def upsert_package_with_chunks(self, data, chunks, source_zip=None):
+        '''Upsert a package graph and link its chunks in a single write transaction.
+
+        Chunks left over from an earlier ingest of the same package (by package
+        IRI, else by ZIP name) that are not among the given chunks are deleted
+        once the new ones are written.
+
+        Packages with more than tx_rows chunks write the graph in one transaction
+        and the chunks in further transactions of tx_rows each, so no single
+        transaction has to hold the whole package.
 
-        Returns:
-            None
-        '''
-        for val in values:
-            s.run(f"""
-                MATCH (n {{iri:$iri}})
-                MERGE (m:{label} {{iri:$val}})
-                MERGE (n)-[:{rel}]->(m)
-            """, iri=iri, val=val)
-
-    def link_chunks(self, chunks):
-        '''Link text chunks to their parent nodes in the Neo4j graph database.
-        
         Args:
-            chunks: List of chunk dictionaries with "chunk_id", "path", "start", "end", and "parent_iri".
+            data: Dictionary containing package, documents, topics, and renditions.
+            chunks: List of chunk dictionaries with "chunk_id", "package", "source_zip", "path", "start", "end", and "parent_iri".
+
+            source_zip: Name of the ZIP the chunks come from; scopes the cleanup
+                when the package has no IRI.
 
         Returns:
             None
         '''
-        with self.driver.session() as s:
-            for c in chunks:
-                s.run("""
-                    MERGE (ch:Chunk {chunk_id:$cid})
-                    SET ch.path=$path, ch.start_char=$start, ch.end_char=$end
-                    WITH ch
-                    MATCH (n {iri:$parent})
-                    MERGE (ch)-[:DERIVED_FROM]->(n)
-                """, cid=c["chunk_id"], path=c["path"], start=c["start"], end=c["end"], parent=c["parent_iri"])
-
-    # Convenience collection helpers
-    def _collect(self, s, iri, rel):
-        '''Collect related node IRIs for a given node and relationship type.
-        
+        kinds = _kinds(data)
+        piri = (data.get("package") or {}).get("iri")
+        scope = ("package", piri) if piri else ("source_zip", source_zip) if source_zip else None
+        keep = [c["chunk_id"] for c in chunks]
+
+        if len(chunks) > self.tx_rows:
+            with self.session() as s:
+                self.upsert_graph(data)
+                self.link_chunks(chunks, kinds)
+                if scope:
+                    while s.execute_write(self._delete_stale_chunks, scope, keep):
+                        pass
+            return
+
+        def work(tx):
+            self._write_graph(tx, data)
+            self._write_chunks(tx, chunks, kinds)
+            if scope:
+                while self._delete_stale_chunks(tx, scope, keep):
+                    pass
+
+        with self.session() as s:
+            s.execute_write(work)
+        self.clear_cache()
+
+    def _delete_stale_chunks(self, s, scope, keep):
+        '''Delete up to tx_rows chunks of a package that are not in keep.
+
         Args:
-            s: Neo4j session.
-            iri: IRI of the source node.
-            rel: Relationship type.
+            s: Neo4j session or transaction.
+            scope: ("package", iri) or ("source_zip", name) selecting the package's chunks.
+            keep: Chunk ids written by the current ingest.
 
         Returns:
-            List of related node IRIs.
+            Number of chunks deleted.
         '''
-        rec = s.run(f"""
-            MATCH (n {{iri:$iri}})-[:{rel}]->(m)
-            RETURN collect(distinct m.iri) AS items
-        """, iri=iri).single()
-        return rec["items"] if rec else []
+        key, val = scope
+        return s.run(_stale_chunks_query(key), val=val, keep=keep, limit=self.tx_rows).single()["n"]
 
-    def fetch_variants(self, iri):
-        '''Fetch product variant IRIs related to a given node IRI.
+    def clear_cache(self):
+        '''Drop all cached find_parents results.'''
+        with self._parents_lock:
+            self._parents_cache.clear()
+
+    def _write_graph(self, s, data):
+        '''Run the graph upsert statements on a session or transaction.
+
+        Rows are sent in bulk with UNWIND: one statement per node kind, per
+        attribute relationship and for the renditions (per batch_size rows),
+        instead of one per item.
 
         Args:
-            iri: IRI of the source node.
+            s: Neo4j session or transaction.
+            data: Dictionary containing package, documents, topics, and renditions.
 
         Returns:
-            List of related product variant IRIs.
+            None
         '''
-        with self.driver.session() as s:
-            return self._collect(s, iri, "RELATES_TO_PRODUCT_VARIANT")
-    def fetch_components(self, iri):
-        '''Fetch component IRIs related to a given node IRI.
+        piri = (data.get("package") or {}).get("iri")
+        if piri:
+            s.run("MERGE (p:Package {iri:$iri})", iri=piri)
+
+        by_kind = {}
+        for node in data.get("documents", []) + data.get("topics", []):
+            by_kind.setdefault(node["kind"], []).append(node)
+        kind_of = _kinds(data)
+
+        for kind, nodes in by_kind.items():
+            rows = [{
+                "iri": node["iri"], "label": node.get("label"), "language": node.get("language"),
+                "status_value": (node.get("status") or {}).get("value"),
+                "status_date": (node.get("status") or {}).get("date"),
+            } for node in nodes]
+            for batch in _batches(rows, self.batch_size):
+                s.run(_merge_iu_query(kind), rows=batch)
+                if piri:
+                    s.run(_link_package_query(kind), iris=[row["iri"] for row in batch], piri=piri)
+
+            for field, label, rel in ATTR_RELS:
+                self._attach_array(s, kind, [(node["iri"], val) for node in nodes for val in node.get(field, [])], label, rel)
+
+        # renditions grouped by their parent's label so the parent lookup uses its index
+        rend_by_kind = {}
+        for r in data.get("renditions", []):
+            rend_by_kind.setdefault(kind_of.get(r["parent_iri"]), []).append(
+                {"parent": r["parent_iri"], "src": r["source_path"], "fmt": r.get("format")})
+        for kind, rows in rend_by_kind.items():
+            for batch in _batches(rows, self.batch_size):
+                s.run(_rendition_query(kind), rows=batch)
+
+    def _attach_array(self, s, kind, pairs, label, rel):
+        '''Attach related nodes to nodes of one kind via relationships, in bulk.
+        
         Args:
-            iri: IRI of the source node.
+            s: Neo4j session or transaction.
+            kind: Label of the source nodes ("Document" or "Topic").
+            pairs: List of (source IRI, related IRI) tuples.
+            label: Label of the related nodes.
+            rel: Relationship type.
 
         Returns:
-            List of related component IRIs.
+            None
         '''
-        with self.driver.session() as s:
-            return self._collect(s, iri, "RELATES_TO_COMPONENT")
+        rows = [{"src": src, "val": val} for src, val in pairs]
+        for batch in _batches(rows, self.batch_size):
+            s.run(_attach_query(kind, label, rel), rows=batch)
+
+    def link_chunks(self, chunks, kinds=None):
+        '''Link text chunks to their parent nodes, committing every tx_rows chunks.
         
-    def fetch_roles(self, iri):
-        '''Fetch role IRIs related to a given node IRI.
         Args:
-            iri: IRI of the source node.
+            chunks: List of chunk dictionaries with "chunk_id", "package", "source_zip", "path", "start", "end", and "parent_iri".
+            kinds: Optional dict mapping parent IRIs to their label (Document/Topic).
 
         Returns:
-            List of related role IRIs.
+            None
         '''
-        with self.driver.session() as s:
-            return self._collect(s, iri, "HAS_ROLE")
-        
-    def fetch_doc_types(self, iri):
-        '''Fetch document type IRIs related to a given node IRI.
-        
+        with self.session() as s:
+            for part in _batches(chunks, self.tx_rows):
+                s.execute_write(self._write_chunks, part, kinds)
+
+    def _write_chunks(self, s, chunks, kinds=None):
+        '''Run the chunk linking statements on a session or transaction.
+
+        Chunks are grouped by their parent's label so the parent MATCH can use
+        the label's iri index; parents of unknown kind are matched without one.
+
         Args:
-            iri: IRI of the source node.
+            s: Neo4j session or transaction.
+            chunks: List of chunk dictionaries with "chunk_id", "package", "source_zip", "path", "start", "end", and "parent_iri".
+            kinds: Optional dict mapping parent IRIs to their label (Document/Topic).
 
         Returns:
-            List of related document type IRIs.
+            None
         '''
-        with self.driver.session() as s:
-            return self._collect(s, iri, "APPLIES_TO_DOCUMENT_TYPE")
+        kinds = kinds or {}
+        by_kind = {}
+        for c in chunks:
+            by_kind.setdefault(kinds.get(c["parent_iri"]), []).append(c)
+        for kind, rows in by_kind.items():
+            for batch in _batches(rows, self.batch_size):
+                s.run(_chunk_query(kind), rows=batch)
 
     # NEW: GraphRAG helper – find IU IRIs matching high-level filters
     def find_parents(
@@ -211,53 +428,31 @@ class Neo4jStore:
 
         Returns:
             List of parent node IRIs matching the given filters.
+            Results are cached per filter set for FIND_PARENTS_CACHE_TTL seconds
+            and dropped whenever this store writes a package graph.
         '''
-        product_variants = list(product_variants or [])
-        components       = list(components or [])
-        roles            = list(roles or [])
-        doc_types        = list(doc_types or [])
-        subjects         = list(subjects or [])
-        phases           = list(phases or [])
-
-        with self.driver.session() as s:
-            q = "MATCH (n) "
-            where_clauses = []
-            params = {}
-
-            if product_variants:
-                q += "MATCH (n)-[:RELATES_TO_PRODUCT_VARIANT]->(pv:ProductVariant) "
-                where_clauses.append("pv.iri IN $product_variants")
-                params["product_variants"] = product_variants
-
-            if components:
-                q += "MATCH (n)-[:RELATES_TO_COMPONENT]->(c:Component) "
-                where_clauses.append("c.iri IN $components")
-                params["components"] = components
-
-            if roles:
-                q += "MATCH (n)-[:HAS_ROLE]->(r:Role) "
-                where_clauses.append("r.iri IN $roles")
-                params["roles"] = roles
-
-            if doc_types:
-                q += "MATCH (n)-[:APPLIES_TO_DOCUMENT_TYPE]->(d:DocType) "
-                where_clauses.append("d.iri IN $doc_types")
-                params["doc_types"] = doc_types
-
-            if subjects:
-                q += "MATCH (n)-[:HAS_SUBJECT]->(s:Subject) "
-                where_clauses.append("s.iri IN $subjects")
-                params["subjects"] = subjects
-
-            if phases:
-                q += "MATCH (n)-[:HAS_LIFECYCLE_PHASE]->(ph:LifecyclePhase) "
-                where_clauses.append("ph.iri IN $phases")
-                params["phases"] = phases
-
-            if where_clauses:
-                q += "WHERE " + " AND ".join(where_clauses) + " "
-
-            q += "RETURN collect(distinct n.iri) AS iris"
-
-            rec = s.run(q, **params).single()
-            return rec["iris"] if rec and rec["iris"] is not None else []
+        # order/duplicates within a facet don't change the result, so normalise for the cache key
+        key = tuple(tuple(sorted(set(v or ()))) for v in
+                    (product_variants, components, roles, doc_types, subjects, phases))
+        now = time.monotonic()
+        with self._parents_lock:
+            cached = self._parents_cache.get(key)
+            if cached is not None and cached[0] > now:
+                self._parents_cache.move_to_end(key)
+                return list(cached[1])
+
+        params = dict(zip(("product_variants", "components", "roles", "doc_types", "subjects", "phases"),
+                          map(list, key)))
+        with self.session() as s:
+            iris = s.execute_read(
+                lambda tx: [rec["iri"] for rec in tx.run(FIND_PARENTS_QUERY, limit=FIND_PARENTS_MAX + 1, **params)])
+        if len(iris) > FIND_PARENTS_MAX:
+            log.warning(f"find_parents: more than {FIND_PARENTS_MAX} matches, truncating")
+            del iris[FIND_PARENTS_MAX:]
+
+        with self._parents_lock:
+            self._parents_cache[key] = (now + FIND_PARENTS_CACHE_TTL, tuple(iris))
+            self._parents_cache.move_to_end(key)
+            if len(self._parents_cache) > FIND_PARENTS_CACHE_SIZE:
+                self._parents_cache.popitem(last=False)
+        return iris
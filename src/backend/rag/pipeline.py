@@ -3,10 +3,16 @@ from backend.rag.chroma_store import ChromaStore
 from backend.rag.neo4j_store import Neo4jStore
 from backend.rag.embeddings import get_embedder
 from typing import Optional, Dict, Any, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import logging
+import os
 
 log = logging.getLogger("rag.pipeline")
 
+# embeds questions while the calling thread resolves graph filters in Neo4j
+_query_pool = ThreadPoolExecutor(max_workers=int(os.getenv("QUERY_WORKERS", "4")), thread_name_prefix="query")
+
 class IirdsRagPipeline:
 
     # Define which metadata fields are arrays in Chroma
@@ -102,14 +108,16 @@ class IirdsRagPipeline:
                 if isinstance(x, (list, tuple, set)):
                     return list(x)
                 return [x]
-            parent_iris = self.neo4j.find_parents(
-                product_variants=norm(graph_filters["product_variants"]) if "product_variants" in graph_filters else None,
-                components=norm(graph_filters["components"]) if "components" in graph_filters else None,
-                roles=norm(graph_filters["roles"]) if "roles" in graph_filters else None,
-                doc_types=norm(graph_filters["doc_types"]) if "doc_types" in graph_filters else None,
-                subjects=norm(graph_filters["subjects"]) if "subjects" in graph_filters else None,
-                phases=norm(graph_filters["phases"]) if "phases" in graph_filters else None,
-            )
+            # one session for all graph lookups of this question
+            with self.neo4j.session():
+                parent_iris = self.neo4j.find_parents(
+                    product_variants=norm(graph_filters["product_variants"]) if "product_variants" in graph_filters else None,
+                    components=norm(graph_filters["components"]) if "components" in graph_filters else None,
+                    roles=norm(graph_filters["roles"]) if "roles" in graph_filters else None,
+                    doc_types=norm(graph_filters["doc_types"]) if "doc_types" in graph_filters else None,
+                    subjects=norm(graph_filters["subjects"]) if "subjects" in graph_filters else None,
+                    phases=norm(graph_filters["phases"]) if "phases" in graph_filters else None,
+                )
 
         return parent_iris, chroma_filters
 
@@ -124,10 +132,18 @@ class IirdsRagPipeline:
             filters: Optional dict of metadata filters.
             k: Number of top results to return.
             
-        Returns: List of search hits.
+        Returns: List of Hit tuples.
         '''
+        # the question embedding doesn't depend on the graph lookup, so overlap the two
+        qvec_future = _query_pool.submit(self.chroma.embed_query, question, self.embed)
+
         # 1) Use Neo4j to pre-select parent_iri via graph filters (GraphRAG)
         parent_iris, chroma_filters = self._prepare_graph_and_chroma_filters(filters)
+        if parent_iris is not None and not parent_iris:
+            # graph filters were given but matched nothing: no vector search needed
+            qvec_future.cancel()
+            log.info("semantic_search: graph filters matched no parents, skipping Chroma")
+            return []
 
         # 2) Build Chroma where-clause from remaining scalar filters
         where = self._build_where(chroma_filters)
@@ -141,7 +157,8 @@ class IirdsRagPipeline:
                 where = parent_clause
 
         log.info(f"semantic_search: q='{question[:80]}' k={k} where={where}")
-        hits = self.chroma.search(question, k, self.embed, where=where)
+        qvec = qvec_future.result()
+        hits = self.chroma.search(question, k, self.embed, where=where, query_embedding=qvec)
         log.info(f"semantic_search: hits={len(hits)}")
         return hits
 
@@ -158,10 +175,27 @@ class IirdsRagPipeline:
             k: Number of top results to retrieve.
             return_hits: Whether to return raw hits along with context and citations.
         Returns:
-            Tuple of (context string, citations list, [optional hits list])
+            Tuple of (context string, citations list, [optional list of Hit])
         '''
         hits = self.semantic_search(question, filters, k)
-        ctx = "\n\n---\n\n".join(h["text"] for h in hits)
+        ctx = "\n\n---\n\n".join(h.text for h in hits)
         log.info(f"answer_context: ctx_chars={len(ctx)} citations={len(hits)}")
-        citations = [{"parent_iri": h["metadata"]["parent_iri"], "path": h["metadata"]["path"]} for h in hits]
+        citations = [{"parent_iri": h.metadata["parent_iri"], "path": h.metadata["path"]} for h in hits]
         return (ctx, citations, hits) if return_hits else (ctx, citations)
+
+    async def aanswer_context(
+        self, question: str, filters: Optional[Dict[str, Any]] = None, k: int = 8, return_hits: bool = False
+    ) -> Tuple[str, list, List[dict]]:
+        '''
+        Async variant of answer_context; runs the blocking Neo4j/Chroma/embedding
+        calls in a worker thread so the event loop stays free.
+
+        Args:
+            question: The input question string.
+            filters: Optional dict of metadata filters.
+            k: Number of top results to retrieve.
+            return_hits: Whether to return raw hits along with context and citations.
+        Returns:
+            Tuple of (context string, citations list, [optional hits list])
+        '''
+        return await asyncio.to_thread(self.answer_context, question, filters, k, return_hits)
@@ -1,10 +1,25 @@
 # src/frontend/app.py
 '''Streamlit frontend for iiRDS RAG Agent.'''
 import os
+import json
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from urllib3.util.retry import Retry
 
 BACKEND = os.getenv("BACKEND_URL", "http://localhost:8001")
+# chat messages rendered individually; older ones are collapsed into one block
+HISTORY_TAIL = int(os.getenv("HISTORY_TAIL", "20"))
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    '''Keep-alive HTTP session to the backend, shared across Streamlit reruns.'''
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.2))
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
 
 st.set_page_config(page_title="TechDoc RAG Agent", page_icon="📦", layout="wide")
 st.title("TechDoc RAG Agent")
@@ -18,9 +33,12 @@ if st.sidebar.button("Ingest", type="primary", disabled=(zip_file is None)):
         st.sidebar.warning("Choose a file first.")
     else:
         with st.spinner("Ingesting…"):
-            files = {"file": (zip_file.name, zip_file.getvalue(), "application/zip")}
+            # stream the multipart body from the uploaded file instead of copying it into memory
+            zip_file.seek(0)
+            body = MultipartEncoder(fields={"file": (zip_file.name, zip_file, "application/zip")})
             try:
-                r = requests.post(f"{BACKEND}/ingest", files=files, timeout=120)
+                r = http_session().post(f"{BACKEND}/ingest", data=body,
+                                        headers={"Content-Type": body.content_type}, timeout=120)
                 r.raise_for_status()
                 st.sidebar.success(f"Ingested: {r.json()}")
             except Exception as e:
@@ -48,29 +66,54 @@ temperature = st.sidebar.slider("Temperature", min_value=0.0, max_value=1.0, val
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-for m in st.session_state.messages:
+# Streamlit redraws the whole page on each rerun, so only the latest messages get
+# their own chat bubbles; older turns are folded into a single markdown block
+history = st.session_state.messages
+split = max(len(history) - HISTORY_TAIL, 0)
+older, recent = history[:split], history[split:]
+if older:
+    with st.expander(f"Earlier messages ({len(older)})"):
+        st.markdown("\n\n---\n\n".join(f"**{m['role']}:** {m['content']}" for m in older))
+for m in recent:
     with st.chat_message(m["role"]):
         st.markdown(m["content"])
 
 prompt = st.chat_input("Ask a question about your technical docs…")
 
-def ask_backend(question: str, variant_filter: str = "", mode: str = "local",
-                model_override: str = "", temperature: float = 0.2):
+def stream_backend(question: str, variant_filter: str = "", mode: str = "local",
+                   model_override: str = "", temperature: float = 0.2):
+    '''Query the backend in streaming mode.
+
+    Returns:
+        Tuple of (metadata dict, generator of answer tokens).
+    '''
     payload = {
         "question": question,
         "filters": {},
-        "mode": mode,                 # <-- important: tells backend local vs remote
+        "mode": mode,
         "temperature": temperature,
-        "debug": show_debug, 
+        "debug": show_debug,
+        "stream": True,
     }
     if model_override.strip():
         payload["model"] = model_override.strip()
     if variant_filter.strip():
         payload["filters"]["product_variants"] = variant_filter.strip()
 
-    r = requests.post(f"{BACKEND}/query", json=payload, timeout=1200)
+    r = http_session().post(f"{BACKEND}/query", json=payload, timeout=1200, stream=True)
     r.raise_for_status()
-    return r.json()
+    lines = (json.loads(line) for line in r.iter_lines(decode_unicode=True) if line)
+    # first line carries citations/model info, the rest are tokens
+    meta = next(lines, {})
+
+    def tokens():
+        for msg in lines:
+            # the backend reports failures mid-stream as a final error line
+            if "error" in msg:
+                raise RuntimeError(msg["error"])
+            yield msg["token"]
+
+    return meta, tokens()
 
 if prompt:
     # user message
@@ -82,15 +125,16 @@ if prompt:
     with st.chat_message("assistant"):
         placeholder = st.empty()
         try:
-            resp = ask_backend(
+            resp, tokens = stream_backend(
                 question=prompt,
                 variant_filter=variant,
                 mode=mode,
                 model_override=model_override,
                 temperature=temperature,
             )
-            answer = resp.get("answer", "")
-            placeholder.markdown(answer)
+            # render tokens as they arrive instead of waiting for the full reply
+            with placeholder.container():
+                answer = st.write_stream(tokens)
 
             # metadata + citations
             meta_bits = []
@@ -104,8 +148,7 @@ if prompt:
             cits = resp.get("citations", [])
             if cits:
                 with st.expander("Citations"):
-                    for c in cits:
-                        st.markdown(f"- `{c.get('parent_iri','')}` · `{c.get('path','')}`")
+                    st.markdown("\n".join(f"- `{c.get('parent_iri','')}` · `{c.get('path','')}`" for c in cits))
             
             # debugging info
             if resp.get("debug"):